@@ -0,0 +1,97 @@
+'''
+Memory held by fetched Drupal data in its different representations, on synthetic data.
+Produces the table in the README:
+
+    python benchmarks/records_memory.py
+'''
+from collections import namedtuple
+
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from drupal_puller.records import ColumnTable, record_type
+
+
+NODES = 50000
+FIELDS = 20
+ALIASES = 200000
+LANGUAGES = ['en', 'fr', 'und']
+SECTIONS = ['publications', 'events', 'opinion', 'multimedia', 'experts']
+
+FieldSpec = namedtuple('FieldSpec', 'name field_type default')
+SPECS = [FieldSpec('field_%02d' % i, 'string', '') for i in range(FIELDS)]
+
+
+def fresh(value):
+    # A new string object with the same contents, as the database driver returns.
+    return value.encode('utf-8').decode('utf-8')
+
+
+def field_value(nid, i):
+    # Half the fields are mostly distinct (titles, summaries), half low cardinality
+    # (types, flags).
+    if i % 2:
+        return 'Title of node %d, field %d' % (nid, i)
+    return fresh(random.choice(SECTIONS))
+
+
+def alias_row(pid):
+    return (
+        pid,
+        'node/%d' % pid,
+        '%s/some-title-%d' % (random.choice(SECTIONS), pid),
+        fresh(random.choice(LANGUAGES)),
+    )
+
+
+def node_dicts():
+    return dict(
+        (nid, dict((spec.name, field_value(nid, i)) for i, spec in enumerate(SPECS)))
+        for nid in range(NODES)
+    )
+
+
+def node_records():
+    record_class = record_type(SPECS, 'NodeFieldData')
+    return dict(
+        (nid, record_class(*[field_value(nid, i) for i in range(FIELDS)]))
+        for nid in range(NODES)
+    )
+
+
+def alias_tuples():
+    return [alias_row(pid) for pid in range(ALIASES)]
+
+
+def alias_table():
+    return ColumnTable.from_rows(('pid', 'src', 'dst', 'language'), (alias_row(pid) for pid in range(ALIASES)))
+
+
+def alias_table_interned():
+    return ColumnTable.from_rows(
+        ('pid', 'src', 'dst', 'language'),
+        (alias_row(pid) for pid in range(ALIASES)),
+        intern_columns=('language',),
+    )
+
+
+def measure(build):
+    random.seed(1)
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del data
+    return size
+
+
+if __name__ == '__main__':
+    print("Python %s" % sys.version.split()[0])
+    for build in (node_dicts, node_records, alias_tuples, alias_table, alias_table_interned):
+        print("%-22s %6.1f MB" % (build.__name__, measure(build) / 1e6))
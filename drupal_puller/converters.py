@@ -0,0 +1,117 @@
+'''
+Converters for Drupal field values.
+
+These run once per field value across a whole site, so patterns are compiled once and
+converters for low cardinality values (dates, author names) memoize their results.
+'''
+from django.utils.timezone import utc
+from datetime import datetime, timedelta
+
+import re
+import six
+
+try:
+    from functools import lru_cache
+except ImportError:
+    def lru_cache(maxsize=128):
+        # Minimal stand in for Python 2: the cache is emptied when it fills up.
+        def decorator(func):
+            cache = {}
+
+            def wrapper(*args):
+                try:
+                    return cache[args]
+                except KeyError:
+                    pass
+
+                if len(cache) >= maxsize:
+                    cache.clear()
+                value = cache[args] = func(*args)
+                return value
+
+            wrapper.cache_clear = cache.clear
+            return wrapper
+        return decorator
+
+
+CONVERTER_CACHE_SIZE = 4096
+
+DRUPAL_TIME_RE = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})(?:T(\d{2}):(\d{2}):(\d{2})(Z|([+-])(\d{2}):(\d{2}))?)?\Z'
+)
+NAMES_CLEANUP_RE = re.compile(r'et al\.|Edited by')
+NAMES_SPLIT_RE = re.compile(r',|\s+and\s+|\s+with\s+')
+
+_fromisoformat = getattr(datetime, 'fromisoformat', None)
+
+
+@lru_cache(maxsize=CONVERTER_CACHE_SIZE)
+def parse_drupal_time(value):
+    '''
+    Parse "YYYY-MM-DD", "YYYY-MM-DDTHH:MM:SS" and the latter followed by "Z" or a "+HH:MM"
+    offset into an aware UTC datetime. Raises ValueError for anything else, whatever else
+    the running Python's fromisoformat would accept.
+    '''
+    match = DRUPAL_TIME_RE.match(value)
+    if match is None:
+        raise ValueError("Unrecognized Drupal time: %r" % value)
+
+    if _fromisoformat is not None:
+        # fromisoformat only accepts a trailing "Z" from Python 3.11 on.
+        new_date = _fromisoformat(value[:-1] if value.endswith('Z') else value)
+    else:
+        new_date = datetime(*[int(part) for part in match.groups()[:6] if part is not None])
+        if match.group(8):
+            offset = timedelta(hours=int(match.group(9)), minutes=int(match.group(10)))
+            new_date -= offset if match.group(8) == '+' else -offset
+
+    if new_date.tzinfo is None:
+        return new_date.replace(tzinfo=utc)
+    return new_date.astimezone(utc)
+
+
+def string_converter(value):
+    if six.PY2 and isinstance(value, six.binary_type):
+        return value.decode('latin1').strip()
+    else:
+        return value.strip()
+
+
+def datetime_converter(value):
+    value = value.strip()
+    if value != '':
+        return parse_drupal_time(value)
+    else:
+        return None
+
+
+@lru_cache(maxsize=CONVERTER_CACHE_SIZE)
+def _parse_person_names(names):
+    cleaned_names = NAMES_CLEANUP_RE.sub('', string_converter(names))
+    return tuple(tuple(name.strip().rsplit(None, 1)) for name in NAMES_SPLIT_RE.split(cleaned_names))
+
+
+def person_names_converter(names):
+    # The parsed names are cached, so hand out fresh lists the caller is free to change.
+    return [list(name_parts) for name_parts in _parse_person_names(names)]
+
+
+def reference_converter(value):
+    return int(value)
+
+
+def batch_converter(converter):
+    '''
+    Turn a per value converter into one taking the whole column at once, converting each
+    distinct value only once.
+    '''
+    def convert_batch(values):
+        converted = {}
+        ret = []
+        for value in values:
+            if value not in converted:
+                converted[value] = converter(value)
+            ret.append(converted[value])
+        return ret
+
+    return convert_batch
@@ -1,55 +1,458 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from django.utils.timezone import utc, make_aware
+from django.apps import apps
+from django.utils.timezone import make_aware
 from datetime import datetime
 from collections import namedtuple
 from optparse import make_option
 
 
 import MySQLdb
+import MySQLdb.cursors
 import importlib
-import re
+import os
 import pytz
-import six
+import threading
+import time
+
+from drupal_puller.converters import (
+    parse_drupal_time, string_converter, datetime_converter, person_names_converter, reference_converter,
+    batch_converter,
+)
+from drupal_puller.schema import DeferredIndexes
+from drupal_puller.sweep import CHUNK_SIZE, OrphanSweep, chunked, link_pages
+from drupal_puller.records import ColumnTable, record_type
 
 
 verbosity = 1
 
+FETCH_BATCH_SIZE = 2000
+
+
+def fetch_table(cursor, fields, intern_columns=()):
+    '''
+    Read the rest of the cursor's results into a ColumnTable, in batches. Only with an
+    unbuffered cursor (MySQLdb.cursors.SSCursor) is the full list of result tuples never
+    held at once; the default cursor has already buffered it in execute().
+    '''
+    table = ColumnTable(fields, intern_columns)
+    while True:
+        rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not rows:
+            break
+        table.extend(rows)
+    return table
+
+
+class QueryProfiler(object):
+    '''
+    Runs EXPLAIN on every SELECT sent to the source, times it and counts its rows, and
+    writes a report flagging full table scans and filesorts over `threshold` rows.
+    '''
+    def __init__(self, report_path, threshold=10000):
+        self.report_path = report_path
+        self.threshold = threshold
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def explain(self, raw_connection, query, args=None):
+        if not query.lstrip().upper().startswith('SELECT'):
+            return None
+
+        cursor = raw_connection.cursor()
+        try:
+            cursor.execute("EXPLAIN " + query, args)
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except MySQLdb.Error as e:
+            return [{'error': str(e)}]
+        finally:
+            cursor.close()
+
+    def warnings(self, plan):
+        warnings = []
+        for step in plan or []:
+            rows = step.get('rows') or 0
+            if rows < self.threshold:
+                continue
+
+            if step.get('type') == 'ALL':
+                warnings.append("full scan of %s (%d rows)" % (step.get('table'), rows))
+            if 'filesort' in (step.get('Extra') or ''):
+                warnings.append("filesort on %s (%d rows)" % (step.get('table'), rows))
+        return warnings
+
+    def record(self, query, args, plan, duration, row_count):
+        warnings = self.warnings(plan)
+        with self._lock:
+            self.entries.append((query, args, plan, duration, row_count, warnings))
+
+        if warnings and verbosity > 1: print("Slow source query (%s): %s" % ("; ".join(warnings), " ".join(query.split())))
+
+    def write_report(self):
+        with self._lock:
+            entries = list(self.entries)
+
+        flagged = [entry for entry in entries if entry[5]]
+
+        with open(self.report_path, 'w') as report:
+            report.write("Source queries: %d, flagged: %d, total time: %.2fs\n" % (
+                len(entries), len(flagged), sum(entry[3] for entry in entries)))
+
+            for query, args, plan, duration, row_count, warnings in entries:
+                report.write("\n%s\n" % ("=" * 78))
+                report.write("%.3fs, %d rows%s\n" % (duration, row_count, " -- " + "; ".join(warnings) if warnings else ""))
+                report.write("%s\n" % query.strip())
+                if args:
+                    report.write("args: %r\n" % (args,))
+                for step in plan or []:
+                    report.write("  %s\n" % ", ".join("%s=%s" % item for item in sorted(step.items())))
+
+
+# MySQL client errors meaning the connection was lost: "server has gone away"
+# and "lost connection to server during query".
+CONNECTION_LOST_ERRORS = (2006, 2013)
+
+
+class SourceCursor(object):
+    '''
+    Cursor which reconnects and retries once when the connection to the source has been lost.
+
+    When profiling, a query is recorded once its cursor is closed or runs the next query,
+    with the time from execute() to the last fetch. Unbuffered cursors read rows from the
+    server while they are fetched, so both the time and the row count are only known then.
+    '''
+    def __init__(self, source_connection, cursorclass=None):
+        self.source_connection = source_connection
+        self.cursorclass = cursorclass
+        self.cursor = source_connection.raw_connection.cursor(cursorclass)
+        self._profile = None
+
+    def execute(self, query, args=None):
+        self._record_profile()
+
+        profiler = self.source_connection.profiler
+        if profiler is None:
+            return self._execute(query, args)
+
+        plan = profiler.explain(self.source_connection.raw_connection, query, args)
+        start = time.time()
+        result = self._execute(query, args)
+        # [query, args, plan, start, last fetch, rows fetched]
+        self._profile = [query, args, plan, start, time.time(), 0]
+        return result
+
+    def _execute(self, query, args):
+        try:
+            return self.cursor.execute(query, args)
+        except MySQLdb.OperationalError as e:
+            if e.args[0] not in CONNECTION_LOST_ERRORS:
+                raise
+
+            if verbosity > 1: print("Source connection lost, reconnecting: %s" % e)
+            self.source_connection.connect()
+            self.cursor = self.source_connection.raw_connection.cursor(self.cursorclass)
+            return self.cursor.execute(query, args)
+
+    def _fetched(self, row_count):
+        if self._profile is not None:
+            self._profile[4] = time.time()
+            self._profile[5] += row_count
+
+    def _record_profile(self):
+        if self._profile is None:
+            return
+
+        query, args, plan, start, last_fetch, fetched_count = self._profile
+        self._profile = None
+
+        if isinstance(self.cursor, MySQLdb.cursors.CursorUseResultMixIn):
+            row_count = fetched_count
+        else:
+            row_count = self.cursor.rowcount
+        self.source_connection.profiler.record(query, args, plan, last_fetch - start, row_count)
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        self._fetched(0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self.cursor.fetchmany() if size is None else self.cursor.fetchmany(size)
+        self._fetched(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self._fetched(len(rows))
+        return rows
+
+    def __iter__(self):
+        if self._profile is None:
+            return iter(self.cursor)
+        return self._iter_profiled()
+
+    def _iter_profiled(self):
+        for row in self.cursor:
+            self._fetched(1)
+            yield row
+
+    def close(self):
+        self._record_profile()
+        self.cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class SourceConnection(object):
+    '''
+    A connection to the Drupal database. The session statements are run every time
+    the connection is (re)opened.
+    '''
+    def __init__(self, config, session_statements=(), profiler=None):
+        self.config = config
+        self.session_statements = list(session_statements)
+        self.profiler = profiler
+        self.raw_connection = None
+        self.connect()
+
+    def connect(self):
+        if self.raw_connection is not None:
+            try:
+                self.raw_connection.close()
+            except MySQLdb.Error:
+                pass
+
+        self.raw_connection = MySQLdb.connect(**self.config)
+
+        cursor = self.raw_connection.cursor()
+        for statement in self.session_statements:
+            cursor.execute(statement)
+        cursor.close()
+
+    def cursor(self, cursorclass=None):
+        return SourceCursor(self, cursorclass)
+
+    def close(self):
+        if self.raw_connection is not None:
+            self.raw_connection.close()
+            self.raw_connection = None
+
+    def __getattr__(self, name):
+        return getattr(self.raw_connection, name)
+
+
+class ConnectionPoolExhausted(Exception):
+    pass
+
+
+class ConnectionPool(object):
+    '''
+    A small pool of source connections. The main connection, opened with open_main(), is
+    kept by the thread which opened it and does not count against the pool. Every other
+    thread gets its own connection on first use and keeps it until it calls release(); at
+    most `size` of those are open at once. A thread waiting longer than `timeout` seconds
+    for one gets ConnectionPoolExhausted.
+    '''
+    def __init__(self, config, size=1, session_statements=(), profiler=None, timeout=60):
+        self.config = config
+        self.size = size
+        self.session_statements = list(session_statements)
+        self.profiler = profiler
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+        self._idle = []
+        self._all = []
+
+    def new_connection(self):
+        connection = SourceConnection(self.config, self.session_statements, self.profiler)
+        with self._lock:
+            self._all.append(connection)
+        return connection
+
+    def open_main(self):
+        connection = self.new_connection()
+        self._local.connection = connection
+        self._local.holds_slot = False
+        return connection
+
+    def acquire_slot(self):
+        # Polling instead of acquire(timeout=...), which Python 2 does not have.
+        deadline = time.time() + self.timeout
+        while not self._slots.acquire(False):
+            if time.time() >= deadline:
+                raise ConnectionPoolExhausted(
+                    "All %d source connections are in use; raise source_pool_size or release() "
+                    "connections in finished threads." % self.size
+                )
+            time.sleep(0.05)
+
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            return connection
+
+        self.acquire_slot()
+        try:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+
+            if connection is None:
+                connection = self.new_connection()
+        except Exception:
+            self._slots.release()
+            raise
+
+        self._local.connection = connection
+        self._local.holds_slot = True
+        return connection
+
+    def release(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or not self._local.holds_slot:
+            return
+
+        self._local.connection = None
+        with self._lock:
+            self._idle.append(connection)
+        self._slots.release()
+
+    def close_all(self):
+        with self._lock:
+            for connection in self._all:
+                connection.close()
+            self._all = []
+            self._idle = []
+
 
 class BaseImporter():
     taxonomy_term_data_table_name = 'term_data'
     load_url_aliases_query = "SELECT pid, src, dst FROM url_alias"
 
+    # Set to False for partial or incremental runs, where rows missing from a
+    # loader's results have not actually been deleted in Drupal.
+    sweep_orphans = True
+
+    # Fields the loaders look rows up by. Their indexes are kept during an initial load.
+    initial_load_keep_fields = ('nid', 'eid', 'source_id', 'pid', 'rid', 'src', 'page_path', 'redirect_redirect_uri')
+
+    # Source connection settings. Values given in SITE_DATABASE_CONFIG take precedence.
+    # The whole import runs in one read only, consistent snapshot transaction per
+    # connection; InnoDB only honours the snapshot under REPEATABLE READ. A reconnect
+    # starts a new snapshot. source_pool_size is the number of worker thread connections,
+    # in addition to self.connection.
+    source_pool_size = 1
+    source_pool_timeout = 60
+    source_compress = False
+    source_charset = 'utf8mb4'
+    source_isolation_level = 'REPEATABLE READ'
+    source_consistent_snapshot = True
+
     def __init__(self, app):
         self.site_name = app
         self.connection = None
+        self.connection_pool = None
+        self.query_profiler = None
+        self.orphan_sweep = OrphanSweep()
 
     @staticmethod
     def convert_drupal_time(original):
-        try:
-            new_date = datetime.strptime(original, "%Y-%m-%dT%H:%M:%SZ")
-        except ValueError:
-            try:
-                new_date = datetime.strptime(original, "%Y-%m-%dT%H:%M:%S")
-            except ValueError:
-                new_date = datetime.strptime(original, "%Y-%m-%d")
-
-        new_date = new_date.replace(tzinfo=utc)
-        return new_date
+        return parse_drupal_time(original)
 
     def open_connection(self):
-        config = self.get_database_configuration()
-        self.connection = MySQLdb.connect(**config)
+        self.connection_pool = ConnectionPool(
+            self.get_connection_options(),
+            size=self.source_pool_size,
+            session_statements=self.get_session_statements(),
+            profiler=self.query_profiler,
+            timeout=self.source_pool_timeout,
+        )
+        self.connection = self.connection_pool.open_main()
 
     def close_connection(self):
-        self.connection.close()
+        self.connection_pool.close_all()
+        self.connection = None
+
+    def get_connection(self):
+        '''
+        Return the source connection for the calling thread: self.connection in the thread
+        which opened it, a pooled connection in any other. Worker threads should call
+        self.connection_pool.release() when they are done with it.
+        '''
+        return self.connection_pool.connection()
 
     def get_database_configuration(self):
         return settings.SITE_DATABASE_CONFIG[self.site_name]
 
+    def get_schema_state_path(self):
+        '''
+        File recording the indexes and constraints dropped by an initial load until they
+        have been recreated.
+        '''
+        state_dir = getattr(settings, 'DRUPAL_PULLER_STATE_DIR', os.getcwd())
+        return os.path.join(state_dir, 'drupal_import_%s_deferred_schema.json' % self.site_name)
+
+    def get_target_models(self):
+        '''
+        The models this importer loads into, including many to many tables. Defaults to
+        every model of the app the importer belongs to.
+        '''
+        app_config = apps.get_containing_app_config(type(self).__module__)
+        return list(app_config.get_models(include_auto_created=True))
+
+    def get_connection_options(self):
+        options = dict(self.get_database_configuration())
+
+        if self.source_compress:
+            options.setdefault('compress', True)
+
+        if self.source_charset:
+            options.setdefault('charset', self.source_charset)
+            options.setdefault('use_unicode', True)
+
+        return options
+
+    def get_session_statements(self):
+        statements = [
+            "SET SESSION TRANSACTION ISOLATION LEVEL %s" % self.source_isolation_level,
+            "SET SESSION TRANSACTION READ ONLY",
+        ]
+
+        if self.source_consistent_snapshot:
+            statements.append("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+
+        return statements
+
+    def track_seen_keys(self, model_class, key_field, seen_keys):
+        if self.sweep_orphans:
+            self.orphan_sweep.track(model_class, key_field, seen_keys)
+
+    def sweep_deleted_rows(self):
+        '''
+        Delete the rows the loaders did not see during this run, then the pages no longer
+        linked from any model.
+        '''
+        for model_class, removed_count in self.orphan_sweep.sweep():
+            if verbosity > 1:
+                if removed_count is None:
+                    print("%s: No rows seen, sweep skipped" % model_class.__name__)
+                else:
+                    print("%s: Removed %d" % (model_class.__name__, removed_count))
+
     def load_terms(self, model_class, connection):
         added_count = 0
         updated_count = 0
+        seen_keys = set()
         cursor = connection.cursor()
         query = "SELECT tid, name FROM {0} WHERE vid=%s".format(self.taxonomy_term_data_table_name)
 
@@ -61,6 +464,7 @@ class BaseImporter():
             term, created = model_class.objects.get_or_create(source_id=tid)
             term.name = name
             term.save()
+            seen_keys.add(tid)
 
             if created:
                 added_count += 1
@@ -69,28 +473,34 @@ class BaseImporter():
 
         cursor.close()
 
+        self.track_seen_keys(model_class, 'source_id', seen_keys)
+
         if verbosity > 1: print("%ss: Added %d, Update %d" % (model_class.__name__, added_count, updated_count))
 
     def load_url_aliases(self, connection, alias_model):
         added_count = 0
         updated_count = 0
-        cursor = connection.cursor()
+        seen_keys = set()
+        cursor = connection.cursor(MySQLdb.cursors.SSCursor)
 
         query = self.load_url_aliases_query
         cursor.execute(query)
-        results = cursor.fetchall()
-        for (pid, src, dst) in results:
-            alias, created = alias_model.objects.get_or_create(pid=pid)
-            alias.src = src
-            alias.dst = dst
+        results = fetch_table(cursor, ('pid', 'src', 'dst'))
+        cursor.close()
+
+        for row in results:
+            alias, created = alias_model.objects.get_or_create(pid=row.pid)
+            alias.src = row.src
+            alias.dst = row.dst
             alias.save()
+            seen_keys.add(row.pid)
 
             if created:
                 added_count += 1
             else:
                 updated_count += 1
 
-        cursor.close()
+        self.track_seen_keys(alias_model, 'pid', seen_keys)
 
         if verbosity > 1: print("Url Aliases: Added %d, Update %d" % (added_count, updated_count))
 
@@ -98,11 +508,14 @@ class BaseImporter():
                           additional_field_list=None, additional_field_setter=None, page_matcher=None):
         added_count = 0
         updated_count = 0
+        seen_keys = set()
+        self.orphan_sweep.track_pages(page_model)
         cursor = connection.cursor()
 
         extra_fields = ""
         if additional_field_list:
             extra_fields = ", ct1.%s" % ", ct1.".join(additional_field_list)
+            additional_fields_class = record_type(additional_field_list, 'AdditionalFields')
 
         query = "SELECT n.nid, n.vid, n.title, n.status, n.created, n.changed %s "\
                 "FROM  %s ct1 "\
@@ -131,15 +544,16 @@ class BaseImporter():
             node.changed = datetime.fromtimestamp(changed_ts)
 
             if additional_field_setter:
-                extra_values = values[6:]
+                extra_values = additional_fields_class(*values[6:])
                 additional_field_setter(node, extra_values)
 
             node.save()
+            seen_keys.add(nid)
 
             if page_matcher:
                 page_matcher(node, page_model, alias_model)
             else:
-                self.match_to_pages(node, page_model, alias_model)
+                self.match_to_pages(node, page_model, alias_model, self.sweep_orphans)
 
 
             if node_created:
@@ -149,6 +563,8 @@ class BaseImporter():
 
         cursor.close()
 
+        self.track_seen_keys(content_type, 'nid', seen_keys)
+
         if verbosity > 1: print("%s: Added %d, Update %d" % (content_type.__name__, added_count, updated_count))
 
     def load_node_references(self, connection, content_type, content_type_table,
@@ -221,26 +637,17 @@ class BaseImporter():
         #if verbosity > 1: print "Unlinked Authors Updated"
 
     @staticmethod
-    def match_to_pages(node, page_model, alias_model):
+    def match_to_pages(node, page_model, alias_model, replace=False):
         src = "node/%d" % node.nid
+        page_paths = ["/%s" % src, "/%s/" % src]
 
-        page, created = page_model.objects.get_or_create(page_path="/%s" % src)
-        node.pages.add(page)
-
-        page, created = page_model.objects.get_or_create(page_path="/%s/" % src)
-        node.pages.add(page)
-
-        aliases = alias_model.objects.filter(src=src)
+        aliases = list(alias_model.objects.filter(src=src))
         for alias in aliases:
-            node.aliases.add(alias)
+            page_paths.append("/%s" % alias.dst)
+            page_paths.append("/%s/" % alias.dst)
 
-            page_path = "/%s" % alias.dst
-            page, created = page_model.objects.get_or_create(page_path=page_path)
-            node.pages.add(page)
-
-            page_path = "/%s/" % alias.dst
-            page, created = page_model.objects.get_or_create(page_path=page_path)
-            node.pages.add(page)
+        pages = [page_model.objects.get_or_create(page_path=page_path)[0] for page_path in page_paths]
+        link_pages(node, pages, aliases, replace)
 
 
 ColumnMap = namedtuple('ColumnMap', 'drupal_name model_name type_or_map')
@@ -251,6 +658,11 @@ def column_map(drupal_name, model_name=None, type_or_map=None):
         return ColumnMap(drupal_name, model_name, type_or_map)
 
 
+LinkedField = namedtuple('LinkedField', 'name columns linker')
+def linked_field(name, columns, linker):
+    return LinkedField(name, list(columns), linker)
+
+
 class Drupal7BaseImporter(BaseImporter):
     taxonomy_term_data_table_name = 'taxonomy_term_data'
     load_url_aliases_query = "SELECT pid, source, alias FROM url_alias"
@@ -258,18 +670,22 @@ class Drupal7BaseImporter(BaseImporter):
     def load_drupal_entities(self, connection, model_class, drupal_table_name, column_map_list, page_model, alias_model, resolver, page_matcher=None):
         added_count = 0
         updated_count = 0
-        cursor = connection.cursor()
+        seen_keys = set()
+        self.orphan_sweep.track_pages(page_model)
+        cursor = connection.cursor(MySQLdb.cursors.SSCursor)
 
         query = "SELECT id, {columns} FROM {drupal_table_name}"
         columns = ", ".join([c.drupal_name for c in column_map_list])
 
         cursor.execute(query.format(columns=columns, drupal_table_name=drupal_table_name))
-        results = cursor.fetchall()
-        for values in results:
-            eid = values[0]
+        results = fetch_table(cursor, ['id'] + list(column_map_list))
+        cursor.close()
+
+        for row in results:
+            eid = row[0]
             entity, created = model_class.objects.get_or_create(eid=eid)
 
-            values = values[1:] # discard the id
+            values = row[1:] # discard the id
             for i, column in enumerate(column_map_list):
                 if column.type_or_map == 'naive_datetime':
                     value = make_aware(values[i], pytz.utc)
@@ -282,25 +698,28 @@ class Drupal7BaseImporter(BaseImporter):
                 setattr(entity, column.model_name, value)
 
             entity.save()
+            seen_keys.add(eid)
 
             # TODO: ??
             if page_matcher:
                 page_matcher(entity, page_model, alias_model, resolver)
             else:
-                self.match_entity_to_pages(entity, page_model, alias_model, resolver)
+                self.match_entity_to_pages(entity, page_model, alias_model, resolver, self.sweep_orphans)
 
             if created:
                 added_count += 1
             else:
                 updated_count += 1
 
-        cursor.close()
+        self.track_seen_keys(model_class, 'eid', seen_keys)
 
         if verbosity > 1: print("%s: Added %d, Update %d" % (model_class.__name__, added_count, updated_count))
 
     def load_drupal_nodes(self, connection, model_class, node_type_name, page_model, alias_model, page_matcher=None):
         added_count = 0
         updated_count = 0
+        seen_keys = set()
+        self.orphan_sweep.track_pages(page_model)
         cursor = connection.cursor()
 
         query = "SELECT n.nid, n.vid, n.title, n.status, n.created, n.changed "\
@@ -325,11 +744,12 @@ class Drupal7BaseImporter(BaseImporter):
             node.changed = datetime.fromtimestamp(changed_ts)
 
             node.save()
+            seen_keys.add(nid)
 
             if page_matcher:
                 page_matcher(node, page_model, alias_model)
             else:
-                self.match_to_pages(node, page_model, alias_model)
+                self.match_to_pages(node, page_model, alias_model, self.sweep_orphans)
 
             if node_created:
                 added_count += 1
@@ -338,6 +758,8 @@ class Drupal7BaseImporter(BaseImporter):
 
         cursor.close()
 
+        self.track_seen_keys(model_class, 'nid', seen_keys)
+
         if verbosity > 1: print("%s: Added %d, Update %d" % (model_class.__name__, added_count, updated_count))
 
     def load_linked_data_field(
@@ -349,89 +771,78 @@ class Drupal7BaseImporter(BaseImporter):
         linked_content_field_columns,
         linker
     ):
+        self.load_linked_data_fields(
+            connection,
+            content_type,
+            node_type_name,
+            [linked_field(linked_content_field_name, linked_content_field_columns, linker)],
+        )
 
+    def load_linked_data_fields(self, connection, content_type, node_type_name, linked_fields):
+        '''
+        Load several data fields of one bundle at once. linked_fields is a list of
+        linked_field(name, columns, linker). The rows of every field are merged by entity_id,
+        then each object has all of its linkers applied, in field order, and is saved once.
+        Linkers get a record of the field's columns, read by position or by column name.
+        '''
         linked_nodes = 0
         unlinked_nodes = 0
 
-        cursor = connection.cursor()
+        field_rows = {}
 
-        query = """
+        for field in linked_fields:
+            values_class = record_type(field.columns, 'LinkedFieldValues')
+            cursor = connection.cursor()
+
+            query = """
 SELECT f.entity_id{linked_content_field_columns}
 FROM field_data_{linked_content_field_name} f
-WHERE f.bundle = '{node_type_name}'
+WHERE f.bundle = %s
+ORDER BY f.entity_id, f.delta
 """
-        query = query.format(
-            linked_content_field_columns=", f.%s" % ", f.".join(linked_content_field_columns),
-            linked_content_field_name=linked_content_field_name,
-            node_type_name=node_type_name,
-        )
-
-        cursor.execute(query)
-        results = cursor.fetchall()
-        for data in results:
-            nid = data[0]
-            data_values = data[1:]
-            ct_object = content_type.objects.get(nid=nid)
-
-            linker(ct_object, data_values)
-            ct_object.save()
-
-        cursor.close()
-
-    @staticmethod
-    def match_entity_to_pages(entity, page_model, alias_model, resolver):
-        main_src, extra_srcs = resolver(entity)
-
-        for src in [main_src] + extra_srcs:
-            page, created = page_model.objects.get_or_create(page_path=src)
-            entity.pages.add(page)
-
-        # TODO: How should we handle alaises
-        aliases = alias_model.objects.filter(src=main_src)
-        for alias in aliases:
-            entity.aliases.add(alias)
-
-            page_path = "/%s" % alias.dst
-            page, created = page_model.objects.get_or_create(page_path=page_path)
-            entity.pages.add(page)
-
-            page_path = "/%s/" % alias.dst
-            page, created = page_model.objects.get_or_create(page_path=page_path)
-            entity.pages.add(page)
+            query = query.format(
+                linked_content_field_columns=", f.%s" % ", f.".join(field.columns),
+                linked_content_field_name=field.name,
+            )
 
+            cursor.execute(query, (node_type_name,))
+            for data in cursor.fetchall():
+                field_rows.setdefault(data[0], []).append((field.linker, values_class(*data[1:])))
 
-def string_converter(value):
-    if six.PY2:
-        return value.decode('latin1').strip()
-    else:
-        return value.strip()
+            cursor.close()
 
+        for nids in chunked(sorted(field_rows), CHUNK_SIZE):
+            ct_objects = dict((o.nid, o) for o in content_type.objects.filter(nid__in=nids))
 
-def datetime_converter(value):
-    value = value.strip()
-    if value != '':
-        return datetime.strptime(
-            value,
-            "%Y-%m-%dT%H:%M:%S",
-        ).replace(tzinfo=utc)
-    else:
-        return None
+            for nid in nids:
+                ct_object = ct_objects.get(nid)
+                if ct_object is None:
+                    unlinked_nodes += 1
+                    print("Exception: Unlinked Node ID: %s" % nid)
+                    continue
 
+                for linker, data_values in field_rows[nid]:
+                    linker(ct_object, data_values)
 
-def person_names_converter(names):
-    names = string_converter(names)
-    cleaned_names = names.replace("et al.", "").replace("Edited by", "")
-    name_list = re.split(',|\s+and\s+|\s+with\s+', cleaned_names)
+                ct_object.save()
+                linked_nodes += 1
 
-    def parse_name(name):
-        name_parts = name.strip().rsplit(None, 1)
-        return name_parts
+        if verbosity > 1: print("%s fields %s: Linked Nodes: %s, Unlinked Nodes: %s" % (
+            content_type.__name__, ", ".join(field.name for field in linked_fields), linked_nodes, unlinked_nodes))
 
-    return [parse_name(name) for name in name_list]
+    @staticmethod
+    def match_entity_to_pages(entity, page_model, alias_model, resolver, replace=False):
+        main_src, extra_srcs = resolver(entity)
+        page_paths = [main_src] + extra_srcs
 
+        # TODO: How should we handle alaises
+        aliases = list(alias_model.objects.filter(src=main_src))
+        for alias in aliases:
+            page_paths.append("/%s" % alias.dst)
+            page_paths.append("/%s/" % alias.dst)
 
-def reference_converter(value):
-    return int(value)
+        pages = [page_model.objects.get_or_create(page_path=page_path)[0] for page_path in page_paths]
+        link_pages(entity, pages, aliases, replace)
 
 
 TFieldSpec = namedtuple('FieldSpec', ['name', 'field_type', 'default'])
@@ -452,9 +863,34 @@ class Drupal8BaseImporter(BaseImporter):
         'reference': reference_converter,
     }
 
+    # Converters taking the whole column of values for a field at once, registered with
+    # register_converter(batch=True). These take precedence over field_type_converters.
+    field_type_batch_converters = {}
+
+    # Field types whose values repeat a lot and convert to immutable values. Their per value
+    # converter is run once per distinct value of a field.
+    deduplicated_field_types = ('datetime', 'reference')
+
+    @classmethod
+    def register_converter(cls, field_type, converter, batch=False):
+        '''
+        Register a converter for field_type on this importer class. Batch converters are
+        called with the list of all values of a field and must return a list of the same length.
+        '''
+        attribute = 'field_type_batch_converters' if batch else 'field_type_converters'
+        converters = dict(getattr(cls, attribute))
+        converters[field_type] = converter
+        setattr(cls, attribute, converters)
+
+        if not batch and field_type in cls.field_type_batch_converters:
+            batch_converters = dict(cls.field_type_batch_converters)
+            del batch_converters[field_type]
+            cls.field_type_batch_converters = batch_converters
+
     def load_redirects(self, connection, redirect_model):
         added_count = 0
         updated_count = 0
+        seen_keys = set()
         cursor = connection.cursor()
 
         query = '''
@@ -470,6 +906,7 @@ FROM redirect r
             ))
             redirect, created = redirect_model.objects.get_or_create(rid=redirect_data['rid'])
             redirect_model.objects.filter(rid=redirect.rid).update(**redirect_data)
+            seen_keys.add(redirect.rid)
 
             if created:
                 added_count += 1
@@ -478,6 +915,8 @@ FROM redirect r
 
         cursor.close()
 
+        self.track_seen_keys(redirect_model, 'rid', seen_keys)
+
         if verbosity > 1: print("Url Redirect: Added %d, Update %d" % (added_count, updated_count))
 
     def load_drupal_nodes(self, connection, model_class, node_type_name, page_model, alias_model, redirect_model, page_matcher=None):
@@ -487,6 +926,8 @@ FROM redirect r
         '''
         added_count = 0
         updated_count = 0
+        seen_keys = set()
+        self.orphan_sweep.track_pages(page_model)
         cursor = connection.cursor()
 
         query = "SELECT n.nid, n.vid, n.title, n.status, n.created, n.changed "\
@@ -511,13 +952,14 @@ FROM redirect r
             node.changed = datetime.fromtimestamp(changed_ts)
 
             node.save()
+            seen_keys.add(nid)
 
             if page_matcher:
                 page_matcher(node, page_model, alias_model)
+                self.match_to_redirect(node, page_model, redirect_model)
             else:
-                self.match_to_pages(node, page_model, alias_model)
-
-            self.match_to_redirect(node, page_model, redirect_model)
+                redirect_pages = self.get_redirect_pages(node, page_model, redirect_model)
+                self.match_to_pages(node, page_model, alias_model, self.sweep_orphans, redirect_pages)
 
             if node_created:
                 added_count += 1
@@ -526,14 +968,32 @@ FROM redirect r
 
         cursor.close()
 
-    def get_node_field_data(self, connection, bundle_name, specs):
+        self.track_seen_keys(model_class, 'nid', seen_keys)
+
+        if verbosity > 1: print("%s: Added %d, Update %d" % (model_class.__name__, added_count, updated_count))
+
+    def get_node_field_data(self, connection, bundle_name, specs, compact=False):
         '''
         Grab all the data and return a dictionary in the format {entity_id: { spec.name: value }}
         for all of the FieldSpecs in specs. The value has been converted based on field_type.
+
+        With compact=True the values are __slots__ records (see drupal_puller.records) instead
+        of dicts, read by attribute: {entity_id: record}, with record.<spec.name> as the value.
         '''
         ret = {}
-
-        for spec in specs:
+        record_class = record_type(specs, 'NodeFieldData') if compact else None
+
+        def default_values():
+            defaults = []
+            for s in specs:
+                default = s.default
+                if callable(default):
+                    default = default()
+                defaults.append(default)
+            return defaults
+
+        for spec_index, spec in enumerate(specs):
+            key = record_class._fields[spec_index] if compact else spec.name
             cursor = connection.cursor()
 
             value_field_template = 'field_{field_name}_value'
@@ -556,28 +1016,39 @@ ORDER BY entity_id, delta
 
             cursor.execute(query)
             results = cursor.fetchall()
-            for values in results:
-                nid = values[0]
-                value = values[1]
 
-                if nid not in ret:
-                    default_value = dict()
+            converted_values = [values[1] for values in results]
+            if spec.field_type in self.field_type_batch_converters:
+                converted_values = self.field_type_batch_converters[spec.field_type](converted_values)
+            elif spec.field_type in self.field_type_converters:
+                converter = self.field_type_converters[spec.field_type]
+                if spec.field_type in self.deduplicated_field_types:
+                    converted_values = batch_converter(converter)(converted_values)
+                else:
+                    converted_values = [converter(value) for value in converted_values]
 
-                    for s in specs:
-                        default = s.default
-                        if callable(default):
-                            default = default()
-                        default_value[s.name] = default
+            for values, value in zip(results, converted_values):
+                nid = values[0]
 
-                    ret[nid] = default_value
+                if nid not in ret:
+                    if compact:
+                        ret[nid] = record_class(*default_values())
+                    else:
+                        ret[nid] = dict(zip([s.name for s in specs], default_values()))
 
-                if spec.field_type in self.field_type_converters:
-                    value = self.field_type_converters[spec.field_type](value)
+                if compact:
+                    current = getattr(ret[nid], key)
+                else:
+                    current = ret[nid][key]
 
-                if isinstance(ret[nid][spec.name], list):
-                    ret[nid][spec.name].append(value)
+                if isinstance(current, list):
+                    current.append(value)
+                elif compact:
+                    setattr(ret[nid], key, value)
                 else:
-                    ret[nid][spec.name] = value
+                    ret[nid][key] = value
+
+            cursor.close()
 
         return ret
 
@@ -626,40 +1097,40 @@ WHERE t.bundle = '{bundle_name}'
 
             ret[nid].append(term_instance)
 
+        cursor.close()
+
         return ret
 
     @staticmethod
-    def match_to_pages(node, page_model, alias_model):
+    def match_to_pages(node, page_model, alias_model, replace=False, extra_pages=()):
         src = "/node/%d" % node.nid
+        page_paths = [src, "%s/" % src]
 
-        page, created = page_model.objects.get_or_create(page_path=src)
-        node.pages.add(page)
-
-        page, created = page_model.objects.get_or_create(page_path="%s/" % src)
-        node.pages.add(page)
-
-        aliases = alias_model.objects.filter(src=src)
+        aliases = list(alias_model.objects.filter(src=src))
         for alias in aliases:
-            node.aliases.add(alias)
-
-            page_path = "%s" % alias.dst
-            page, created = page_model.objects.get_or_create(page_path=page_path)
-            node.pages.add(page)
+            page_paths.append("%s" % alias.dst)
+            page_paths.append("%s/" % alias.dst)
 
-            page_path = "%s/" % alias.dst
-            page, created = page_model.objects.get_or_create(page_path=page_path)
-            node.pages.add(page)
+        pages = [page_model.objects.get_or_create(page_path=page_path)[0] for page_path in page_paths]
+        link_pages(node, pages + list(extra_pages), aliases, replace)
 
     @staticmethod
-    def match_to_redirect(node, page_model, redirect_model):
+    def get_redirect_pages(node, page_model, redirect_model):
         dest = 'internal:/node/{}'.format(node.nid)
 
+        pages = []
         redirects = redirect_model.objects.filter(redirect_redirect_uri=dest)
         for redirect in redirects:
             page_path = '/{}'.format(redirect.redirect_source_path)
 
             page, created = page_model.objects.get_or_create(page_path=page_path)
-            node.pages.add(page)
+            pages.append(page)
+
+        return pages
+
+    @staticmethod
+    def match_to_redirect(node, page_model, redirect_model):
+        link_pages(node, Drupal8BaseImporter.get_redirect_pages(node, page_model, redirect_model))
 
 
 class Command(BaseCommand):
@@ -670,6 +1141,39 @@ class Command(BaseCommand):
             dest='app',
             help='App name corresponding to Drupal site.'
         ),
+        make_option(
+            '--skip-sweep',
+            action='store_true',
+            dest='skip_sweep',
+            default=False,
+            help='Do not delete rows missing from Drupal (use for partial or incremental runs).'
+        ),
+        make_option(
+            '--initial-load',
+            action='store_true',
+            dest='initial_load',
+            default=False,
+            help='Drop secondary indexes and foreign keys on empty tables while loading, rebuild them at the end.'
+        ),
+        make_option(
+            '--restore-schema',
+            action='store_true',
+            dest='restore_schema',
+            default=False,
+            help='Only recreate the indexes and foreign keys left dropped by an interrupted initial load.'
+        ),
+        make_option(
+            '--explain-queries',
+            dest='explain_queries',
+            help='EXPLAIN and time every source query, writing the report to this file.'
+        ),
+        make_option(
+            '--explain-threshold',
+            dest='explain_threshold',
+            type='int',
+            default=10000,
+            help='Flag full scans and filesorts examining at least this many rows (default 10000).'
+        ),
     )
     help = 'Imports drupal data'
 
@@ -682,7 +1186,36 @@ class Command(BaseCommand):
         app_module = importlib.import_module(app)
 
         importer = app_module.Importer(app)
+        if options['skip_sweep']:
+            importer.sweep_orphans = False
+        if options['explain_queries']:
+            importer.query_profiler = QueryProfiler(options['explain_queries'], options['explain_threshold'])
+
+        deferred_indexes = DeferredIndexes(importer.get_schema_state_path())
+        if deferred_indexes.pending():
+            restored_count = deferred_indexes.restore()
+            if verbosity > 0: print("Restored %d indexes and constraints left by an interrupted initial load" % restored_count)
+        if options['restore_schema']:
+            return
+
+        if options['initial_load']:
+            deferred_count = deferred_indexes.drop(importer.get_target_models(), importer.initial_load_keep_fields)
+            if verbosity > 1: print("Deferred %d indexes and constraints" % deferred_count)
 
-        importer.open_connection()
-        importer.handle_import()
-        importer.close_connection()
+        try:
+            importer.open_connection()
+            importer.handle_import()
+            importer.close_connection()
+
+            # The sweep's lookups and anti-joins need the deferred indexes back.
+            if options['initial_load']:
+                deferred_indexes.restore()
+
+            if importer.sweep_orphans:
+                importer.sweep_deleted_rows()
+        finally:
+            if importer.query_profiler is not None:
+                importer.query_profiler.write_report()
+            if options['initial_load']:
+                # A no-op unless the import failed before they were restored above.
+                deferred_indexes.restore()
@@ -0,0 +1,144 @@
+'''
+Compact containers for rows fetched from the Drupal database.
+
+A dict per entity costs a hash table on top of its values; a record class with
+__slots__ stores the same values in a fixed array. ColumnTable keeps one list per column
+instead of a tuple per row, and can intern the strings of low cardinality columns (bundle
+names, language codes) so each distinct value is stored once.
+'''
+from six.moves import intern
+
+import keyword
+import re
+import six
+
+
+IDENTIFIER_RE = re.compile(r'^[A-Za-z]\w*$')
+
+_record_types = {}
+
+
+def field_name(field):
+    '''
+    Accepts a plain name, a FieldSpec or a ColumnMap.
+    '''
+    if isinstance(field, six.string_types):
+        return field
+    if hasattr(field, 'model_name'):
+        return field.model_name
+    return field.name
+
+
+class Record(object):
+    '''
+    Base class for generated records. Records behave like mutable namedtuples: values are
+    read by attribute or by position, and iterating a record yields its values. They can
+    be passed wherever a loader used to pass a tuple of values.
+    '''
+    __slots__ = ()
+    _fields = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self._fields, values):
+            setattr(self, name, value)
+
+    def _values(self):
+        return tuple(getattr(self, name, None) for name in self._fields)
+
+    def __getitem__(self, index):
+        return self._values()[index]
+
+    def __iter__(self):
+        return iter(self._values())
+
+    def __contains__(self, value):
+        return value in self._values()
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._values() == other._values()
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "%s(%s)" % (
+            type(self).__name__,
+            ", ".join("%s=%r" % (name, getattr(self, name, None)) for name in self._fields),
+        )
+
+    def as_dict(self):
+        return dict(zip(self._fields, self._values()))
+
+
+def record_type(fields, name='Record'):
+    '''
+    Return a __slots__ record class for fields, a list of names, FieldSpecs or ColumnMaps.
+    Names which are not valid attribute names, or repeat an earlier one, are replaced by
+    _<position>, as namedtuple(rename=True) does. Classes are cached, so calling this per
+    query is cheap.
+    '''
+    names = []
+    for i, field in enumerate(fields):
+        attribute = field_name(field)
+        if not IDENTIFIER_RE.match(attribute) or keyword.iskeyword(attribute) or attribute in names:
+            attribute = '_%d' % i
+        names.append(attribute)
+
+    names = tuple(names)
+    key = (name, names)
+
+    if key not in _record_types:
+        _record_types[key] = type(str(name), (Record,), {'__slots__': names, '_fields': names})
+
+    return _record_types[key]
+
+
+def intern_value(value):
+    if isinstance(value, str):
+        return intern(value)
+    return value
+
+
+class ColumnTable(object):
+    '''
+    Column oriented storage for fetched rows. Only the columns named in intern_columns are
+    interned; interning columns of mostly distinct values (paths, titles) costs memory.
+    '''
+    def __init__(self, fields, intern_columns=()):
+        self.record_class = record_type(fields, 'Row')
+        self.columns = [[] for name in self.record_class._fields]
+        self.interned = [name in intern_columns for name in self.record_class._fields]
+
+    @classmethod
+    def from_rows(cls, fields, rows, intern_columns=()):
+        table = cls(fields, intern_columns)
+        table.extend(rows)
+        return table
+
+    def append(self, row):
+        for column, interned, value in zip(self.columns, self.interned, row):
+            column.append(intern_value(value) if interned else value)
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def column(self, name):
+        return self.columns[self.record_class._fields.index(name)]
+
+    def __len__(self):
+        if not self.columns:
+            return 0
+        return len(self.columns[0])
+
+    def __getitem__(self, index):
+        return self.record_class(*[column[index] for column in self.columns])
+
+    def __iter__(self):
+        for values in zip(*self.columns):
+            yield self.record_class(*values)
@@ -0,0 +1,263 @@
+'''
+Deferred index and constraint builds for first time imports into empty tables.
+'''
+from django.db import connections, DEFAULT_DB_ALIAS
+
+import json
+import os
+
+
+# Index types which can be recreated from their columns alone, when the database does
+# not report the index definition.
+PLAIN_INDEX_TYPES = (None, 'idx', 'btree')
+
+
+class DeferredIndexes(object):
+    '''
+    Drops the secondary indexes and foreign key constraints of empty tables for the length
+    of a first full import, then recreates them, which rebuilds the indexes and validates
+    the loaded rows against the constraints.
+
+    Everything is read from the database, so indexes from Meta.indexes and index_together
+    are deferred too. Unique and primary key indexes are never dropped, nor are indexes
+    starting with the column of one of keep_fields, which the loaders look rows up by.
+
+    The dropped indexes and constraints are written to state_path before anything is
+    dropped, and the file is only removed once they have all been recreated. If the
+    process dies in between, the next run (or restore()) puts them back.
+
+    On MySQL every table is altered with a single ALTER TABLE, both ways. Elsewhere the
+    foreign keys of a table are added with one ALTER TABLE and each index is built with
+    its own CREATE INDEX, which does not rewrite the table. SQLite cannot add foreign keys
+    to an existing table, so only its indexes are deferred.
+    '''
+    def __init__(self, state_path, using=DEFAULT_DB_ALIAS):
+        self.state_path = state_path
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def quote(self, name):
+        return self.connection.ops.quote_name(name)
+
+    def pending(self):
+        return os.path.exists(self.state_path)
+
+    def load_state(self):
+        with open(self.state_path) as state:
+            return json.load(state)
+
+    def save_state(self, entries):
+        temp_path = "%s.tmp" % self.state_path
+        with open(temp_path, 'w') as state:
+            json.dump(entries, state, indent=2)
+        os.rename(temp_path, self.state_path)
+
+    def empty_tables(self, target_models):
+        tables = []
+        for model in target_models:
+            opts = model._meta
+            if opts.abstract or opts.proxy or not opts.managed or opts.db_table in tables:
+                continue
+            if not model._default_manager.using(self.using).exists():
+                tables.append(opts.db_table)
+        return tables
+
+    def deferrable(self, cursor, table, keep_columns):
+        entries = []
+        defer_foreign_keys = self.connection.vendor != 'sqlite'
+
+        for name, info in self.connection.introspection.get_constraints(cursor, table).items():
+            if info['primary_key'] or info['unique']:
+                continue
+
+            if info['foreign_key'] and defer_foreign_keys:
+                entries.append({
+                    'table': table,
+                    'name': name,
+                    'kind': 'foreign_key',
+                    'columns': info['columns'],
+                    'references': list(info['foreign_key']),
+                })
+
+            if not info['index'] or not info['columns'] or info['columns'][0] in keep_columns:
+                continue
+
+            definition = info.get('definition')
+            if not definition and (info.get('type') not in PLAIN_INDEX_TYPES or 'DESC' in (info.get('orders') or [])):
+                continue
+
+            entries.append({
+                'table': table,
+                'name': name,
+                'kind': 'index',
+                'columns': info['columns'],
+                'definition': definition,
+            })
+
+        return entries
+
+    def drop(self, target_models, keep_fields=()):
+        '''
+        Drop the deferrable indexes and constraints of the empty tables among target_models.
+        Returns the number dropped.
+        '''
+        if self.pending():
+            raise RuntimeError("Indexes from an earlier initial load are still deferred; restore them first.")
+
+        keep_columns = set()
+        for model in target_models:
+            for field in model._meta.local_fields:
+                if field.name in keep_fields:
+                    keep_columns.add(field.column)
+
+        entries = []
+        with self.connection.cursor() as cursor:
+            for table in self.empty_tables(target_models):
+                entries.extend(self.deferrable(cursor, table, keep_columns))
+
+        if not entries:
+            return 0
+
+        self.save_state(entries)
+        try:
+            self.execute(self.drop_statements(entries))
+        except Exception:
+            self.restore()
+            raise
+
+        return len(entries)
+
+    def restore(self):
+        '''
+        Recreate everything recorded in the state file which does not exist yet, then remove
+        the file. Returns the number of indexes and constraints recreated.
+        '''
+        if not self.pending():
+            return 0
+
+        entries = self.load_state()
+
+        with self.connection.cursor() as cursor:
+            existing = {}
+            for table in set(entry['table'] for entry in entries):
+                existing[table] = self.connection.introspection.get_constraints(cursor, table)
+
+        missing = [
+            entry for entry in entries
+            if not self.exists(existing[entry['table']].get(entry['name']), entry['kind'])
+        ]
+
+        failures = []
+        for table, statements in self.create_statements(missing):
+            try:
+                self.execute(statements)
+            except Exception as e:
+                failures.append("%s: %s" % (table, e))
+
+        if failures:
+            raise RuntimeError(
+                "Could not restore indexes and constraints, still recorded in %s:\n%s"
+                % (self.state_path, "\n".join(failures))
+            )
+
+        os.remove(self.state_path)
+        return len(missing)
+
+    @staticmethod
+    def exists(info, kind):
+        if info is None:
+            return False
+        if kind == 'foreign_key':
+            return bool(info['foreign_key'])
+        return bool(info['index'])
+
+    def execute(self, statements):
+        with self.connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def columns_sql(self, columns):
+        return ", ".join(self.quote(column) for column in columns)
+
+    def by_table(self, entries):
+        tables = []
+        grouped = {}
+        for entry in entries:
+            if entry['table'] not in grouped:
+                tables.append(entry['table'])
+                grouped[entry['table']] = []
+            grouped[entry['table']].append(entry)
+        return [(table, grouped[table]) for table in tables]
+
+    def drop_statements(self, entries):
+        statements = []
+        mysql = self.connection.vendor == 'mysql'
+
+        for table, table_entries in self.by_table(entries):
+            clauses = []
+            index_statements = []
+
+            # Foreign keys first: MySQL will not drop an index a foreign key depends on.
+            for entry in table_entries:
+                if entry['kind'] == 'foreign_key':
+                    if mysql:
+                        clauses.append("DROP FOREIGN KEY %s" % self.quote(entry['name']))
+                    else:
+                        clauses.append("DROP CONSTRAINT %s" % self.quote(entry['name']))
+
+            for entry in table_entries:
+                if entry['kind'] == 'index':
+                    if mysql:
+                        clauses.append("DROP INDEX %s" % self.quote(entry['name']))
+                    else:
+                        index_statements.append("DROP INDEX %s" % self.quote(entry['name']))
+
+            if clauses:
+                statements.append("ALTER TABLE %s %s" % (self.quote(table), ", ".join(clauses)))
+            statements.extend(index_statements)
+
+        return statements
+
+    def create_statements(self, entries):
+        '''
+        Returns [(table, statements)], so a failure on one table does not stop the others.
+        '''
+        ret = []
+        mysql = self.connection.vendor == 'mysql'
+        deferrable = " DEFERRABLE INITIALLY DEFERRED" if self.connection.vendor == 'postgresql' else ""
+
+        for table, table_entries in self.by_table(entries):
+            statements = []
+            clauses = []
+
+            for entry in table_entries:
+                if entry['kind'] != 'index':
+                    continue
+                if mysql:
+                    clauses.append("ADD INDEX %s (%s)" % (self.quote(entry['name']), self.columns_sql(entry['columns'])))
+                elif entry.get('definition'):
+                    statements.append(entry['definition'])
+                else:
+                    statements.append("CREATE INDEX %s ON %s (%s)" % (
+                        self.quote(entry['name']), self.quote(table), self.columns_sql(entry['columns'])))
+
+            for entry in table_entries:
+                if entry['kind'] != 'foreign_key':
+                    continue
+                clauses.append("ADD CONSTRAINT %s FOREIGN KEY (%s) REFERENCES %s (%s)%s" % (
+                    self.quote(entry['name']),
+                    self.columns_sql(entry['columns']),
+                    self.quote(entry['references'][0]),
+                    self.quote(entry['references'][1]),
+                    deferrable,
+                ))
+
+            if clauses:
+                statements.append("ALTER TABLE %s %s" % (self.quote(table), ", ".join(clauses)))
+
+            ret.append((table, statements))
+
+        return ret
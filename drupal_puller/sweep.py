@@ -0,0 +1,109 @@
+'''
+Removal of rows deleted in Drupal.
+'''
+
+CHUNK_SIZE = 500
+
+
+def chunked(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def delete_missing(model_class, key_field, seen_keys, chunk_size=CHUNK_SIZE):
+    '''
+    Delete the rows of model_class whose key_field value is not in seen_keys, in chunks.
+    Returns the number of rows removed.
+    '''
+    existing_keys = set(model_class.objects.values_list(key_field, flat=True))
+    missing_keys = existing_keys - set(seen_keys)
+
+    for chunk in chunked(sorted(missing_keys), chunk_size):
+        model_class.objects.filter(**{"%s__in" % key_field: chunk}).delete()
+
+    return len(missing_keys)
+
+
+def delete_orphan_pages(page_model, chunk_size=CHUNK_SIZE):
+    '''
+    Delete the pages which are not linked from any model. Returns the number of pages removed.
+    '''
+    relations = [
+        f for f in page_model._meta.get_fields()
+        if f.auto_created and not f.concrete and (f.one_to_many or f.one_to_one or f.many_to_many)
+    ]
+    if not relations:
+        return 0
+
+    orphans = page_model.objects.filter(**dict(("%s__isnull" % f.name, True) for f in relations))
+    orphan_ids = list(orphans.values_list('pk', flat=True).distinct())
+
+    for chunk in chunked(orphan_ids, chunk_size):
+        page_model.objects.filter(pk__in=chunk).delete()
+
+    return len(orphan_ids)
+
+
+def replace_related(manager, objs):
+    if hasattr(manager, 'set'):
+        manager.set(objs)
+    else:  # Django < 1.9
+        manager.clear()
+        manager.add(*objs)
+
+
+def link_pages(entity, pages, aliases=None, replace=False):
+    '''
+    Link entity to pages and, unless aliases is None, to aliases. With replace, links which
+    are not in the given lists are removed, so pages an entity no longer resolves to become
+    orphans the sweep deletes.
+    '''
+    if replace:
+        replace_related(entity.pages, pages)
+        if aliases is not None:
+            replace_related(entity.aliases, aliases)
+    else:
+        entity.pages.add(*pages)
+        if aliases:
+            entity.aliases.add(*aliases)
+
+
+class OrphanSweep(object):
+    '''
+    Collects the keys the loaders saw during a run and, once the run is over, deletes the
+    rows which were not seen.
+
+    Keys are collected per model, so loaders filling the same model from several node types
+    share one set and cannot remove each other's rows. A model for which no key was seen at
+    all is left alone: an empty result is much more likely a mistyped node type or table
+    than a site where everything was deleted.
+    '''
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.seen_keys = {}
+        self.page_models = set()
+
+    def track(self, model_class, key_field, keys):
+        self.seen_keys.setdefault((model_class, key_field), set()).update(keys)
+
+    def track_pages(self, page_model):
+        self.page_models.add(page_model)
+
+    def sweep(self):
+        '''
+        Returns a list of (model_class, removed_count), with None as the count for the models
+        which were skipped because no key was seen.
+        '''
+        report = []
+
+        for (model_class, key_field), keys in self.seen_keys.items():
+            if keys:
+                report.append((model_class, delete_missing(model_class, key_field, keys, self.chunk_size)))
+            else:
+                report.append((model_class, None))
+
+        for page_model in self.page_models:
+            report.append((page_model, delete_orphan_pages(page_model, self.chunk_size)))
+
+        return report
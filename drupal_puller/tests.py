@@ -1,3 +1,621 @@
-from django.test import TestCase
+from django.db import connection, models
+from django.test import SimpleTestCase, TransactionTestCase
+from django.utils.timezone import utc
+from datetime import datetime
+from unittest import skipIf
 
-# Create your tests here.
+from drupal_puller import converters
+from drupal_puller.converters import datetime_converter, parse_drupal_time, person_names_converter
+from drupal_puller.records import ColumnTable, record_type
+from drupal_puller.schema import DeferredIndexes
+from drupal_puller.sweep import OrphanSweep, delete_orphan_pages, link_pages
+
+import os
+import six
+import tempfile
+import threading
+
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    import mock
+
+try:
+    from drupal_puller.management.commands import drupal_import
+    from drupal_puller.management.commands.drupal_import import (
+        Drupal7BaseImporter, Drupal8BaseImporter, FieldSpec, linked_field,
+    )
+except ImportError:  # MySQLdb is not installed
+    drupal_import = Drupal7BaseImporter = Drupal8BaseImporter = None
+
+
+class FakeQuerySet(object):
+    def __init__(self, manager, keys):
+        self.manager = manager
+        self.keys = keys
+
+    def delete(self):
+        self.manager.keys -= set(self.keys)
+        self.manager.delete_calls += 1
+
+
+class FakeManager(object):
+    def __init__(self, key_field, keys):
+        self.key_field = key_field
+        self.keys = set(keys)
+        self.delete_calls = 0
+
+    def values_list(self, field, flat=False):
+        assert field == self.key_field and flat
+        return list(self.keys)
+
+    def filter(self, **kwargs):
+        return FakeQuerySet(self, kwargs["%s__in" % self.key_field])
+
+
+def fake_model(key_field, keys):
+    return type('FakeNode', (object,), {'objects': FakeManager(key_field, keys)})
+
+
+class OrphanSweepTest(SimpleTestCase):
+    def test_loaders_sharing_a_model_keep_each_others_rows(self):
+        model = fake_model('nid', [1, 2, 3, 4])
+
+        sweep = OrphanSweep()
+        sweep.track(model, 'nid', [1, 2])  # first node type
+        sweep.track(model, 'nid', [3])  # second node type, same model
+
+        self.assertEqual(sweep.sweep(), [(model, 1)])
+        self.assertEqual(model.objects.keys, set([1, 2, 3]))
+
+    def test_no_keys_seen_skips_the_sweep(self):
+        model = fake_model('nid', [1, 2, 3])
+
+        sweep = OrphanSweep()
+        sweep.track(model, 'nid', [])  # e.g. a mistyped node type
+
+        self.assertEqual(sweep.sweep(), [(model, None)])
+        self.assertEqual(model.objects.keys, set([1, 2, 3]))
+        self.assertEqual(model.objects.delete_calls, 0)
+
+    def test_deletes_in_chunks(self):
+        model = fake_model('pid', range(10))
+
+        sweep = OrphanSweep(chunk_size=3)
+        sweep.track(model, 'pid', [0])
+
+        self.assertEqual(sweep.sweep(), [(model, 9)])
+        self.assertEqual(model.objects.keys, set([0]))
+        self.assertEqual(model.objects.delete_calls, 3)
+
+
+class RecordTest(SimpleTestCase):
+    def test_records_behave_like_tuples(self):
+        record_class = record_type(['title', 'summary'])
+        record = record_class('A title', 'A summary')
+
+        self.assertEqual(record.summary, 'A summary')
+        self.assertEqual(record[0], 'A title')
+        self.assertEqual(record[1:], ('A summary',))
+        self.assertEqual(list(record), ['A title', 'A summary'])
+        self.assertTrue('A title' in record)
+        self.assertFalse('title' in record)
+        self.assertEqual(record.as_dict(), {'title': 'A title', 'summary': 'A summary'})
+
+    def test_invalid_and_repeated_names_are_renamed(self):
+        record_class = record_type(['id', 'n.title', 'id', 'class'])
+        self.assertEqual(record_class._fields, ('id', '_1', '_2', '_3'))
+
+    def test_column_table_interns_only_named_columns(self):
+        rows = [(1, ''.join(['node/', '1']), ''.join(['e', 'n'])), (2, ''.join(['node/', '1']), ''.join(['e', 'n']))]
+        table = ColumnTable.from_rows(('pid', 'src', 'language'), rows, intern_columns=('language',))
+
+        self.assertEqual(len(table), 2)
+        self.assertEqual([row.pid for row in table], [1, 2])
+        self.assertIs(table.column('language')[0], table.column('language')[1])
+        self.assertIsNot(table.column('src')[0], table.column('src')[1])
+
+
+class DrupalTimeTest(SimpleTestCase):
+    accepted = [
+        ('2015-03-04', datetime(2015, 3, 4, tzinfo=utc)),
+        ('2015-03-04T05:06:07', datetime(2015, 3, 4, 5, 6, 7, tzinfo=utc)),
+        ('2015-03-04T05:06:07Z', datetime(2015, 3, 4, 5, 6, 7, tzinfo=utc)),
+        ('2015-03-04T05:06:07+02:00', datetime(2015, 3, 4, 3, 6, 7, tzinfo=utc)),
+        ('2015-03-04T23:06:07-01:30', datetime(2015, 3, 5, 0, 36, 7, tzinfo=utc)),
+    ]
+    rejected = [
+        '20150304',
+        '2015-W10-3',
+        '2015-03-04 05:06',
+        '2015-03-04 05:06:07',
+        '2015-03-04T05:06:07.123',
+        '2015-03-04Z',
+        '2015-03-04T05:06:07\n',
+        '04/03/2015',
+    ]
+
+    def check(self):
+        for value, expected in self.accepted:
+            self.assertEqual(parse_drupal_time(value), expected, value)
+        for value in self.rejected:
+            self.assertRaises(ValueError, parse_drupal_time, value)
+
+    def test_parse_drupal_time(self):
+        self.check()
+
+    def test_parse_drupal_time_without_fromisoformat(self):
+        original = converters._fromisoformat
+        converters._fromisoformat = None
+        parse_drupal_time.cache_clear()
+        try:
+            self.check()
+        finally:
+            converters._fromisoformat = original
+            parse_drupal_time.cache_clear()
+
+    def test_datetime_converter(self):
+        self.assertEqual(datetime_converter(' 2015-03-04T05:06:07 '), datetime(2015, 3, 4, 5, 6, 7, tzinfo=utc))
+        self.assertEqual(datetime_converter('2015-03-04'), datetime(2015, 3, 4, tzinfo=utc))
+        self.assertEqual(datetime_converter('2015-03-04T05:06:07Z'), datetime(2015, 3, 4, 5, 6, 7, tzinfo=utc))
+        self.assertEqual(datetime_converter('  '), None)
+
+
+class PersonNamesTest(SimpleTestCase):
+    def test_separators(self):
+        self.assertEqual(
+            person_names_converter('John Smith, Jane Doe and Bob Ray with Ann Lee'),
+            [['John', 'Smith'], ['Jane', 'Doe'], ['Bob', 'Ray'], ['Ann', 'Lee']],
+        )
+
+    def test_editor_and_et_al_are_dropped(self):
+        self.assertEqual(
+            person_names_converter('Edited by John Smith et al.'),
+            [['John', 'Smith']],
+        )
+
+    def test_single_name_and_compound_first_names(self):
+        self.assertEqual(person_names_converter('Plato'), [['Plato']])
+        self.assertEqual(person_names_converter('Mary Ann Smith'), [['Mary Ann', 'Smith']])
+
+    def test_words_containing_separators_are_not_split(self):
+        self.assertEqual(
+            person_names_converter('Alexander Sandberg and Wither Smith'),
+            [['Alexander', 'Sandberg'], ['Wither', 'Smith']],
+        )
+
+    def test_trailing_separator_gives_empty_name(self):
+        self.assertEqual(person_names_converter('John Smith,'), [['John', 'Smith'], []])
+
+    def test_cached_results_are_not_shared(self):
+        first = person_names_converter('John Smith')
+        first[0].append('changed')
+        self.assertEqual(person_names_converter('John Smith'), [['John', 'Smith']])
+
+
+class FakeCursor(object):
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def execute(self, query, args=None):
+        self.queries.append((query, args))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection(object):
+    '''
+    Each cursor returns the next of the given result sets; the last one is repeated.
+    '''
+    def __init__(self, *result_sets):
+        self.result_sets = list(result_sets)
+        self.cursors = []
+
+    def cursor(self):
+        rows = self.result_sets.pop(0) if len(self.result_sets) > 1 else self.result_sets[0]
+        self.cursors.append(FakeCursor(rows))
+        return self.cursors[-1]
+
+
+class FakeRawCursor(object):
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = list(connection.rows)
+        self.rowcount = len(self.rows)
+
+    def execute(self, query, args=None):
+        self.connection.executed.append(query)
+        errors = self.connection.errors.get(query)
+        if errors:
+            raise errors.pop(0)
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchmany(self, size=1):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def __iter__(self):
+        while self.rows:
+            yield self.rows.pop(0)
+
+    def close(self):
+        pass
+
+
+class FakeRawConnection(object):
+    '''
+    Stands in for the connection MySQLdb.connect() returns. errors maps queries to the
+    exceptions raised by their next executions, in order.
+    '''
+    def __init__(self, rows=(), errors=None):
+        self.rows = rows
+        self.errors = errors or {}
+        self.executed = []
+        self.closed = False
+
+    def cursor(self, cursorclass=None):
+        if cursorclass is not None and issubclass(cursorclass, drupal_import.MySQLdb.cursors.CursorUseResultMixIn):
+            return type('FakeSSCursor', (FakeRawCursor, drupal_import.MySQLdb.cursors.CursorUseResultMixIn), {})(self)
+        return FakeRawCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+def patch_connect(*raw_connections):
+    return mock.patch.object(drupal_import.MySQLdb, 'connect', side_effect=list(raw_connections))
+
+
+@skipIf(drupal_import is None, "MySQLdb is not installed")
+class SourceCursorProfileTest(SimpleTestCase):
+    def source_connection(self, raw_connection):
+        profiler = drupal_import.QueryProfiler(os.path.join(tempfile.mkdtemp(), 'queries.txt'))
+        with patch_connect(raw_connection):
+            return drupal_import.SourceConnection({}, profiler=profiler)
+
+    def test_unbuffered_query_is_recorded_on_close(self):
+        connection = self.source_connection(FakeRawConnection(rows=[(1,), (2,), (3,)]))
+        cursor = connection.cursor(drupal_import.MySQLdb.cursors.SSCursor)
+
+        with mock.patch.object(drupal_import.time, 'time', side_effect=[0, 1, 2, 5]):
+            cursor.execute("SHOW TABLES")
+            self.assertEqual(len(cursor.fetchmany(2)), 2)
+            self.assertEqual(len(cursor.fetchmany(2)), 1)
+            self.assertEqual(connection.profiler.entries, [])
+            cursor.close()
+
+        self.assertEqual(connection.profiler.entries, [("SHOW TABLES", None, None, 5, 3, [])])
+
+    def test_buffered_query_is_recorded_on_the_next_execute(self):
+        connection = self.source_connection(FakeRawConnection(rows=[(1,), (2,)]))
+        cursor = connection.cursor()
+
+        cursor.execute("SHOW TABLES")
+        self.assertEqual(len(list(cursor)), 2)
+        cursor.execute("SHOW DATABASES")
+
+        self.assertEqual([entry[0] for entry in connection.profiler.entries], ["SHOW TABLES"])
+        self.assertEqual(connection.profiler.entries[0][4], 2)
+
+
+def in_thread(func):
+    result = {}
+
+    def run():
+        try:
+            result['connection'] = func()
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    return result
+
+
+@skipIf(drupal_import is None, "MySQLdb is not installed")
+class ConnectionPoolTest(SimpleTestCase):
+    def test_main_connection_does_not_use_a_slot(self):
+        pool = drupal_import.ConnectionPool({}, size=1, timeout=0.1)
+        with patch_connect(FakeRawConnection(), FakeRawConnection()):
+            main = pool.open_main()
+            worker = in_thread(pool.connection)
+
+        self.assertIs(pool.connection(), main)
+        self.assertIsNot(worker['connection'], main)
+
+    def test_exhausted_after_timeout(self):
+        pool = drupal_import.ConnectionPool({}, size=1, timeout=0.1)
+        with patch_connect(FakeRawConnection(), FakeRawConnection()):
+            pool.open_main()
+            first = in_thread(pool.connection)  # never released
+            second = in_thread(pool.connection)
+
+        self.assertTrue('connection' in first)
+        self.assertTrue(isinstance(second['error'], drupal_import.ConnectionPoolExhausted))
+
+    def test_released_connection_is_reused(self):
+        pool = drupal_import.ConnectionPool({}, size=1, timeout=0.1)
+
+        def use_and_release():
+            connection = pool.connection()
+            pool.release()
+            return connection
+
+        with patch_connect(FakeRawConnection()) as connect:
+            first = in_thread(use_and_release)
+            second = in_thread(use_and_release)
+
+        self.assertIs(second['connection'], first['connection'])
+        self.assertEqual(connect.call_count, 1)
+
+
+@skipIf(drupal_import is None, "MySQLdb is not installed")
+class ReconnectTest(SimpleTestCase):
+    session_statements = ["SET NAMES utf8mb4", "START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY"]
+
+    def connect(self, *raw_connections):
+        with patch_connect(*raw_connections) as connect:
+            connection = drupal_import.SourceConnection({}, self.session_statements)
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                self.connect_count = connect.call_count
+        return connection
+
+    def lost(self, code=2006):
+        return drupal_import.MySQLdb.OperationalError(code, "MySQL server has gone away")
+
+    def test_lost_connection_is_reopened_once(self):
+        first = FakeRawConnection(errors={"SELECT 1": [self.lost()]})
+        second = FakeRawConnection()
+
+        connection = self.connect(first, second)
+
+        self.assertEqual(self.connect_count, 2)
+        self.assertTrue(first.closed)
+        self.assertIs(connection.raw_connection, second)
+        self.assertEqual(second.executed, self.session_statements + ["SELECT 1"])
+
+    def test_retry_is_not_repeated(self):
+        first = FakeRawConnection(errors={"SELECT 1": [self.lost(2013)]})
+        second = FakeRawConnection(errors={"SELECT 1": [self.lost(2013)]})
+
+        self.assertRaises(drupal_import.MySQLdb.OperationalError, self.connect, first, second)
+        self.assertEqual(self.connect_count, 2)
+
+    def test_other_errors_are_raised(self):
+        first = FakeRawConnection(errors={"SELECT 1": [drupal_import.MySQLdb.OperationalError(1054, "Unknown column")]})
+
+        self.assertRaises(drupal_import.MySQLdb.OperationalError, self.connect, first)
+        self.assertEqual(self.connect_count, 1)
+
+
+@skipIf(Drupal8BaseImporter is None, "MySQLdb is not installed")
+class RegisterConverterTest(SimpleTestCase):
+    def field_data(self, importer_class, field_type, rows):
+        importer = importer_class('app')
+        data = importer.get_node_field_data(FakeConnection(rows), 'article', [FieldSpec('value', field_type)])
+        return dict((nid, values['value']) for nid, values in data.items())
+
+    def test_batch_converter_takes_precedence(self):
+        class Importer(Drupal8BaseImporter):
+            pass
+
+        Importer.register_converter('string', lambda value: 'single')
+        Importer.register_converter('string', lambda values: ['batch'] * len(values), batch=True)
+
+        self.assertEqual(self.field_data(Importer, 'string', [(1, ' a ')]), {1: 'batch'})
+
+    def test_per_value_converter_replaces_batch_converter(self):
+        class Importer(Drupal8BaseImporter):
+            pass
+
+        Importer.register_converter('reference', lambda values: ['batch'] * len(values), batch=True)
+        Importer.register_converter('reference', lambda value: 'single')
+
+        self.assertEqual(self.field_data(Importer, 'reference', [(1, '5')]), {1: 'single'})
+        self.assertEqual(self.field_data(Drupal8BaseImporter, 'reference', [(1, '5')]), {1: 5})
+
+    def test_class_dict_override_is_used(self):
+        class Importer(Drupal8BaseImporter):
+            field_type_converters = dict(
+                Drupal8BaseImporter.field_type_converters,
+                datetime=lambda value: 'my datetime',
+                reference=lambda value: 'my reference',
+            )
+
+        rows = [(1, '2015-03-04'), (2, '2015-03-04')]
+        self.assertEqual(self.field_data(Importer, 'datetime', rows), {1: 'my datetime', 2: 'my datetime'})
+        self.assertEqual(self.field_data(Importer, 'reference', [(1, '5')]), {1: 'my reference'})
+
+    def test_deduplicated_field_types_convert_each_value_once(self):
+        calls = []
+
+        class Importer(Drupal8BaseImporter):
+            pass
+
+        Importer.register_converter('reference', lambda value: calls.append(value) or int(value))
+
+        self.assertEqual(self.field_data(Importer, 'reference', [(1, '5'), (2, '5'), (3, '6')]), {1: 5, 2: 5, 3: 6})
+        self.assertEqual(calls, ['5', '6'])
+
+    def test_registration_does_not_leak_to_base_class(self):
+        class Importer(Drupal8BaseImporter):
+            pass
+
+        Importer.register_converter('slug', lambda values: values, batch=True)
+
+        self.assertTrue('slug' in Importer.field_type_batch_converters)
+        self.assertFalse('slug' in Drupal8BaseImporter.field_type_batch_converters)
+
+
+class FakeLinkedNode(object):
+    def __init__(self, nid):
+        self.nid = nid
+        self.linked = []
+        self.save_count = 0
+
+    def save(self):
+        self.save_count += 1
+
+
+class FakeNodeManager(object):
+    def __init__(self, nids):
+        self.nodes = dict((nid, FakeLinkedNode(nid)) for nid in nids)
+
+    def filter(self, nid__in):
+        return [self.nodes[nid] for nid in nid__in if nid in self.nodes]
+
+
+@skipIf(Drupal7BaseImporter is None, "MySQLdb is not installed")
+class LinkedDataFieldsTest(SimpleTestCase):
+    url_rows = [(1, 'http://one.example'), (2, 'http://two.example'), (9, 'http://gone.example')]
+    logo_rows = [(1, 10, 'Logo one'), (1, 11, 'Logo one, again'), (3, 30, 'Logo three')]
+
+    def url_linker(self, node, values):
+        node.linked.append(('url', values.partner_url_url))
+
+    def logo_linker(self, node, values):
+        node.linked.append(('logo', values[0], values.partner_logo_alt))
+
+    def load(self, nids=(1, 2, 3)):
+        self.content_type = type('Partner', (object,), {'objects': FakeNodeManager(nids)})
+        self.connection = FakeConnection(self.url_rows, self.logo_rows)
+
+        output = six.StringIO()
+        with mock.patch('sys.stdout', output), mock.patch.object(drupal_import, 'verbosity', 2):
+            Drupal7BaseImporter('app').load_linked_data_fields(self.connection, self.content_type, 'partner', [
+                linked_field('partner_url', ['partner_url_url'], self.url_linker),
+                linked_field('partner_logo', ['partner_logo_fid', 'partner_logo_alt'], self.logo_linker),
+            ])
+        return output.getvalue()
+
+    def test_fields_are_merged_by_entity_id(self):
+        self.load()
+        nodes = self.content_type.objects.nodes
+
+        self.assertEqual(nodes[1].linked, [
+            ('url', 'http://one.example'), ('logo', 10, 'Logo one'), ('logo', 11, 'Logo one, again'),
+        ])
+        self.assertEqual(nodes[2].linked, [('url', 'http://two.example')])
+        self.assertEqual(nodes[3].linked, [('logo', 30, 'Logo three')])
+        self.assertEqual([node.save_count for nid, node in sorted(nodes.items())], [1, 1, 1])
+
+    def test_one_query_per_field(self):
+        self.load()
+
+        self.assertEqual([cursor.queries[0][1] for cursor in self.connection.cursors], [('partner',), ('partner',)])
+        self.assertTrue('field_data_partner_url' in self.connection.cursors[0].queries[0][0])
+        self.assertTrue('f.partner_logo_fid, f.partner_logo_alt' in self.connection.cursors[1].queries[0][0])
+
+    def test_unknown_nodes_are_counted_and_skipped(self):
+        output = self.load(nids=(1, 2))
+
+        self.assertTrue("Unlinked Node ID: 3" in output)
+        self.assertTrue("Unlinked Node ID: 9" in output)
+        self.assertTrue("Linked Nodes: 2, Unlinked Nodes: 2" in output)
+
+
+class DeferredIndexPage(models.Model):
+    page_path = models.CharField(max_length=100, db_index=True)
+    title = models.CharField(max_length=100, db_index=True)
+    kind = models.CharField(max_length=10)
+
+    class Meta:
+        index_together = [('kind', 'title')]
+
+
+class DeferredIndexesTest(TransactionTestCase):
+    def setUp(self):
+        self.state_path = os.path.join(tempfile.mkdtemp(), 'state.json')
+
+    def index_columns(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, DeferredIndexPage._meta.db_table)
+        return sorted(info['columns'] for info in constraints.values() if info['index'] and not info['primary_key'])
+
+    def test_drop_and_restore(self):
+        indexes = self.index_columns()
+        deferred = DeferredIndexes(self.state_path)
+
+        self.assertEqual(deferred.drop([DeferredIndexPage], ['page_path']), 2)
+        self.assertEqual(self.index_columns(), [['page_path']])
+        self.assertTrue(deferred.pending())
+
+        self.assertEqual(deferred.restore(), 2)
+        self.assertEqual(self.index_columns(), indexes)
+        self.assertFalse(deferred.pending())
+
+    def test_interrupted_load_is_restored_from_the_state_file(self):
+        indexes = self.index_columns()
+        DeferredIndexes(self.state_path).drop([DeferredIndexPage])
+
+        # A later run, after the first process died without restoring.
+        deferred = DeferredIndexes(self.state_path)
+        self.assertTrue(deferred.pending())
+        self.assertEqual(deferred.restore(), 3)
+        self.assertEqual(self.index_columns(), indexes)
+
+    def test_tables_with_rows_are_left_alone(self):
+        DeferredIndexPage.objects.create(page_path='/node/1', title='Title', kind='page')
+
+        self.assertEqual(DeferredIndexes(self.state_path).drop([DeferredIndexPage]), 0)
+        self.assertFalse(os.path.exists(self.state_path))
+
+
+class SweepPage(models.Model):
+    page_path = models.CharField(max_length=100)
+
+
+class SweepAlias(models.Model):
+    pid = models.IntegerField()
+
+
+class SweepNode(models.Model):
+    nid = models.IntegerField()
+    pages = models.ManyToManyField(SweepPage)
+    aliases = models.ManyToManyField(SweepAlias)
+
+
+class OrphanPagesTest(TransactionTestCase):
+    def setUp(self):
+        self.node = SweepNode.objects.create(nid=1)
+        self.pages = [SweepPage.objects.create(page_path=path) for path in ('/node/1', '/old-alias', '/unlinked')]
+        self.node.pages.add(*self.pages[:2])
+
+    def page_paths(self):
+        return sorted(SweepPage.objects.values_list('page_path', flat=True))
+
+    def test_only_unlinked_pages_are_deleted(self):
+        self.assertEqual(delete_orphan_pages(SweepPage, chunk_size=1), 1)
+        self.assertEqual(self.page_paths(), ['/node/1', '/old-alias'])
+
+    def test_replaced_links_make_stale_pages_orphans(self):
+        alias = SweepAlias.objects.create(pid=1)
+        link_pages(self.node, self.pages[:1], [alias], replace=True)
+
+        self.assertEqual(list(self.node.aliases.all()), [alias])
+
+        sweep = OrphanSweep()
+        sweep.track_pages(SweepPage)
+        self.assertEqual(sweep.sweep(), [(SweepPage, 2)])
+        self.assertEqual(self.page_paths(), ['/node/1'])
+
+    def test_added_links_keep_stale_pages(self):
+        link_pages(self.node, self.pages[:1])
+
+        self.assertEqual(delete_orphan_pages(SweepPage), 1)
+        self.assertEqual(self.page_paths(), ['/node/1', '/old-alias'])